@@ -0,0 +1,120 @@
+"""
+Streaming ZIP export of generated team documents
+"""
+import os
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import logging
+from storage_handler import StorageHandler
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MAX_CONCURRENCY = int(os.getenv('EXPORT_MAX_CONCURRENCY', '8'))
+
+MANIFEST_NAME = "manifest.json"
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _fetch(record: dict):
+    """Fetch one document, returning (record, bytes or None, error message or None)"""
+    try:
+        return record, StorageHandler.get_document(record['document_name']).getvalue(), None
+    except Exception as e:
+        logger.error(f"Error fetching {record['document_name']} for export: {e}")
+        return record, None, str(e)
+
+
+def _iter_fetched(records, max_workers: int):
+    """Fetch documents concurrently, yielding them as they complete with a bounded number in flight"""
+    pending_records = iter(records)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for record in pending_records:
+            in_flight.add(executor.submit(_fetch, record))
+            if len(in_flight) >= max_workers:
+                break
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                record = next(pending_records, None)
+                if record is not None:
+                    in_flight.add(executor.submit(_fetch, record))
+
+
+def _zip_date_time(value):
+    if not isinstance(value, datetime):
+        value = datetime.now(timezone.utc)
+    # ZIP timestamps cannot predate 1980
+    return max(value.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_documents_zip(records, max_workers: int = EXPORT_MAX_CONCURRENCY):
+    """
+    Stream a ZIP archive of team documents plus a manifest
+
+    Args:
+        records: List of dicts with team_id, team_name, document_name, created_at, updated_at
+        max_workers: Maximum number of concurrent storage fetches
+
+    Yields:
+        bytes: Successive chunks of the ZIP archive
+    """
+    sink = _StreamBuffer()
+    manifest = []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for record, data, error in _iter_fetched(records, max_workers):
+            entry = {
+                'team_id': record['team_id'],
+                'team_name': record['team_name'],
+                'document_name': record['document_name'],
+                'created_at': _isoformat(record.get('created_at')),
+                'generated_at': _isoformat(record.get('updated_at')),
+                'status': 'included' if data is not None else 'missing'
+            }
+            if error:
+                entry['error'] = error
+            manifest.append(entry)
+
+            if data is not None:
+                # .docx files are already deflated, so store them as-is
+                info = zipfile.ZipInfo(record['document_name'], date_time=_zip_date_time(record.get('updated_at')))
+                archive.writestr(info, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+        manifest.sort(key=lambda e: (e['team_name'] or '', e['team_id']))
+        info = zipfile.ZipInfo(MANIFEST_NAME, date_time=_zip_date_time(None))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, json.dumps({
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'documents': manifest
+        }, indent=2))
+    yield sink.drain()
+    logger.info(f"Exported {sum(1 for e in manifest if e['status'] == 'included')} of {len(manifest)} documents")
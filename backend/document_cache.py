@@ -0,0 +1,100 @@
+"""
+In-memory cache of rendered Word documents, keyed by a hash of their source text
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache limits (total bytes held, and largest single document worth caching)
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv('DOCUMENT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+DOCUMENT_CACHE_MAX_ITEM_BYTES = int(os.getenv('DOCUMENT_CACHE_MAX_ITEM_BYTES', str(8 * 1024 * 1024)))
+
+
+class DocumentCache:
+    """Thread-safe LRU cache of rendered document bytes, evicted by total size"""
+
+    def __init__(self, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES,
+                 max_item_bytes: int = DOCUMENT_CACHE_MAX_ITEM_BYTES):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """
+        Build a cache key from the text that determines the rendered document
+
+        Args:
+            parts: Strings that together identify the document (e.g. template id, answer)
+
+        Returns:
+            str: Hex SHA-256 digest of the parts
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Look up rendered bytes and mark them as recently used
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            bytes or None: Cached document bytes, or None on a miss
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store rendered bytes, evicting least recently used entries to stay within max_bytes
+
+        Args:
+            key: Cache key from make_key
+            data: Rendered document bytes
+        """
+        size = len(data)
+        if size > self.max_item_bytes or size > self.max_bytes:
+            logger.info(f"Document of {size} bytes too large to cache")
+            return
+
+        with self._lock:
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self._current_bytes -= len(existing)
+
+            while self._entries and self._current_bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted)
+
+            self._entries[key] = data
+            self._current_bytes += size
+
+    def stats(self) -> dict:
+        """Return current cache usage counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,377 @@
+"""
+Ingestion of SME answers and uploaded files - condenses oversize input before generation
+"""
+import os
+import io
+import threading
+from itertools import chain
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from docx import Document
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Token budgets
+INGEST_MAX_INPUT_TOKENS = int(os.getenv('INGEST_MAX_INPUT_TOKENS', '12000'))
+INGEST_CHUNK_TOKENS = int(os.getenv('INGEST_CHUNK_TOKENS', '3000'))
+INGEST_SUMMARY_MAX_TOKENS = int(os.getenv('INGEST_SUMMARY_MAX_TOKENS', '800'))
+INGEST_MAX_WORKERS = int(os.getenv('INGEST_MAX_WORKERS', '4'))
+INGEST_SUMMARY_MODEL = os.getenv('INGEST_SUMMARY_MODEL', 'gpt-5')
+INGEST_MAX_PASSES = int(os.getenv('INGEST_MAX_PASSES', '3'))
+# Reasoning models spend completion tokens before answering, so allow headroom beyond the summary itself
+INGEST_SUMMARY_REASONING_TOKENS = int(os.getenv('INGEST_SUMMARY_REASONING_TOKENS', '2000'))
+INGEST_SUMMARY_REASONING_EFFORT = os.getenv('INGEST_SUMMARY_REASONING_EFFORT', 'minimal')
+INGEST_TOKENIZER_LOAD_TIMEOUT = float(os.getenv('INGEST_TOKENIZER_LOAD_TIMEOUT', '5'))
+# Share of the budget kept free for uploads when answers alone would fill it
+INGEST_UPLOAD_MIN_TOKENS = int(os.getenv('INGEST_UPLOAD_MIN_TOKENS', '3000'))
+
+SUPPORTED_UPLOAD_EXTENSIONS = ('.txt', '.docx')
+
+
+class InputTooLargeError(Exception):
+    """Raised when input cannot be condensed to fit the token budget"""
+
+
+class UploadError(ValueError):
+    """Raised when an uploaded file is unsupported or cannot be read"""
+
+
+def upload_extension(filename: str) -> str:
+    """Return the lower-cased extension of an uploaded file's original name"""
+    return os.path.splitext(filename or "")[1].lower()
+
+
+def is_supported_upload(filename: str) -> bool:
+    """Check an uploaded file's original name against SUPPORTED_UPLOAD_EXTENSIONS"""
+    return upload_extension(filename) in SUPPORTED_UPLOAD_EXTENSIONS
+
+
+SUMMARY_PROMPT = "You are condensing part of the raw material a subject-matter expert (SME) provided for a " \
+"compliance standard operating procedure. Summarize the excerpt below into concise notes. " \
+"Keep every concrete fact: questions being answered, roles, teams, tools and systems, frequencies, " \
+"thresholds, access requirements, evidence and retention details, escalation paths and exceptions. " \
+"Drop repetition and filler. Do not invent information. " \
+"Keep the summary under {max_tokens} tokens."
+
+# tiktoken is optional - fall back to a character-based estimate without it
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    logger.info("tiktoken unavailable, estimating token counts from character length")
+
+# The encoding may need downloading, so it is loaded lazily in a background thread
+_encoding = None
+_encoding_loaded = threading.Event()
+_encoding_lock = threading.Lock()
+_encoding_load_started = False
+
+
+def _load_encoding():
+    global _encoding
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info(f"tiktoken encoding unavailable, estimating token counts from character length: {e}")
+    finally:
+        _encoding_loaded.set()
+
+
+def _get_encoding():
+    """Return the tiktoken encoding if loaded; the first caller waits up to INGEST_TOKENIZER_LOAD_TIMEOUT"""
+    global _encoding_load_started
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        first_call = not _encoding_load_started
+        if first_call:
+            _encoding_load_started = True
+            threading.Thread(target=_load_encoding, name="tiktoken-load", daemon=True).start()
+    if first_call:
+        _encoding_loaded.wait(INGEST_TOKENIZER_LOAD_TIMEOUT)
+    return _encoding if _encoding_loaded.is_set() else None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or estimate) the number of tokens in a piece of text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Token count
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly 4 characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def iter_upload_paragraphs(file_storage):
+    """
+    Yield non-empty paragraphs from an uploaded .txt or .docx file
+
+    Args:
+        file_storage: Uploaded file (werkzeug FileStorage)
+
+    Yields:
+        str: Paragraph text
+
+    Raises:
+        UploadError: If the file type is unsupported or the file cannot be parsed
+    """
+    extension = upload_extension(file_storage.filename)
+    if extension == ".txt":
+        reader = io.TextIOWrapper(file_storage.stream, encoding="utf-8", errors="replace")
+        paragraph = []
+        for line in reader:
+            if line.strip():
+                paragraph.append(line.rstrip("\n"))
+            elif paragraph:
+                yield "\n".join(paragraph)
+                paragraph = []
+        if paragraph:
+            yield "\n".join(paragraph)
+        reader.detach()
+    elif extension == ".docx":
+        try:
+            doc = Document(file_storage.stream)
+        except Exception as e:
+            # BadZipFile, missing package parts, etc. all mean the upload is not a readable .docx
+            raise UploadError(f"Could not read {file_storage.filename} as a .docx file: {e}")
+        for para in doc.paragraphs:
+            if para.text.strip():
+                yield para.text
+    else:
+        raise UploadError(f"Unsupported file type: {file_storage.filename}")
+
+
+def _split_oversize(paragraph: str, chunk_tokens: int):
+    """Split a single paragraph that exceeds the chunk budget on word boundaries"""
+    piece = []
+    piece_tokens = 0
+    for word in paragraph.split():
+        word_tokens = count_tokens(word + " ")
+        if piece and piece_tokens + word_tokens > chunk_tokens:
+            yield " ".join(piece)
+            piece = []
+            piece_tokens = 0
+        piece.append(word)
+        piece_tokens += word_tokens
+    if piece:
+        yield " ".join(piece)
+
+
+def chunk_paragraphs(paragraphs, chunk_tokens: int = INGEST_CHUNK_TOKENS):
+    """
+    Group paragraphs into chunks of at most chunk_tokens tokens
+
+    Args:
+        paragraphs: Iterable of paragraph strings
+        chunk_tokens: Token budget per chunk
+
+    Yields:
+        str: Chunk text
+    """
+    chunk = []
+    chunk_size = 0
+    for paragraph in paragraphs:
+        tokens = count_tokens(paragraph)
+        pieces = [paragraph] if tokens <= chunk_tokens else list(_split_oversize(paragraph, chunk_tokens))
+        for piece in pieces:
+            piece_tokens = tokens if len(pieces) == 1 else count_tokens(piece)
+            if chunk and chunk_size + piece_tokens > chunk_tokens:
+                yield "\n\n".join(chunk)
+                chunk = []
+                chunk_size = 0
+            chunk.append(piece)
+            chunk_size += piece_tokens
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def summarize_chunks(client, chunks, max_tokens: int = INGEST_SUMMARY_MAX_TOKENS,
+                     model: str = INGEST_SUMMARY_MODEL) -> list:
+    """
+    Summarize chunks concurrently, preserving their order
+
+    Args:
+        client: OpenAI client
+        chunks: Iterable of chunk strings, consumed lazily with at most INGEST_MAX_WORKERS in flight
+        max_tokens: Target length of each summary
+        model: Model used for summarization
+
+    Returns:
+        list: Summary per chunk; a chunk whose summary is empty or cut off is returned unchanged
+    """
+    prompt = SUMMARY_PROMPT.format(max_tokens=max_tokens)
+    options = {}
+    if INGEST_SUMMARY_REASONING_EFFORT:
+        options['reasoning_effort'] = INGEST_SUMMARY_REASONING_EFFORT
+
+    def summarize(chunk):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": chunk}
+            ],
+            max_completion_tokens=max_tokens + INGEST_SUMMARY_REASONING_TOKENS,
+            **options
+        )
+        choice = response.choices[0]
+        summary = choice.message.content or ""
+        if choice.finish_reason != "stop" or not summary.strip():
+            # Never lose SME input - the budget check decides whether the original still fits
+            logger.warning(f"Summary unusable (finish_reason={choice.finish_reason}, "
+                           f"{len(summary)} chars), keeping original chunk")
+            return chunk
+        return summary
+
+    summaries = []
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=INGEST_MAX_WORKERS) as executor:
+        for chunk in chunks:
+            if len(in_flight) >= INGEST_MAX_WORKERS:
+                summaries.append(in_flight.popleft().result())
+            in_flight.append(executor.submit(summarize, chunk))
+        summaries.extend(future.result() for future in in_flight)
+    return summaries
+
+
+def condense(client, paragraphs, budget: int) -> str:
+    """
+    Summarize paragraphs, then the summaries, until the text fits the budget
+
+    Args:
+        client: OpenAI client
+        paragraphs: Iterable of paragraph strings, consumed lazily
+        budget: Maximum tokens for the result
+
+    Returns:
+        str: Condensed text
+
+    Raises:
+        InputTooLargeError: If the text does not fit after INGEST_MAX_PASSES passes or stops shrinking
+    """
+    previous_tokens = None
+    chunks = chunk_paragraphs(paragraphs)
+    # The first pass streams, so its chunk count is unknown; later passes split the budget across chunks
+    max_tokens = min(INGEST_SUMMARY_MAX_TOKENS, budget)
+    for attempt in range(1, INGEST_MAX_PASSES + 1):
+        summaries = summarize_chunks(client, chunks, max_tokens)
+        condensed = "\n\n".join(summaries)
+        condensed_tokens = count_tokens(condensed)
+        logger.info(f"Pass {attempt}: condensed {len(summaries)} chunks to {condensed_tokens} tokens "
+                    f"(budget {budget})")
+        if condensed_tokens <= budget:
+            return condensed
+        if previous_tokens is not None and condensed_tokens >= previous_tokens:
+            break
+        chunks = list(chunk_paragraphs(summaries))
+        max_tokens = max(min(INGEST_SUMMARY_MAX_TOKENS, budget // len(chunks)), 1)
+        previous_tokens = condensed_tokens
+
+    raise InputTooLargeError(f"Input could not be condensed below {budget} tokens")
+
+
+def fit_or_condense(client, paragraphs, budget: int):
+    """
+    Return paragraphs verbatim if they fit the budget, otherwise condense them
+
+    Paragraphs are read lazily and only buffered until the budget is exceeded; the rest
+    of the stream goes straight into chunking.
+
+    Returns:
+        tuple: (text, whether it was condensed)
+    """
+    paragraphs = iter(paragraphs)
+    buffered = []
+    tokens = 0
+    for paragraph in paragraphs:
+        buffered.append(paragraph)
+        tokens += count_tokens(paragraph)
+        if tokens > budget:
+            return condense(client, chain(buffered, paragraphs), budget), True
+    return "\n\n".join(buffered), False
+
+
+def _text_paragraphs(text: str) -> list:
+    return [p for p in text.split("\n\n") if p.strip()]
+
+
+def _iter_upload_material(uploads):
+    for upload in uploads:
+        yield f"Supporting material ({upload.filename}):"
+        yield from iter_upload_paragraphs(upload)
+
+
+def _answer_token_cap(sizes, budget: int):
+    """Largest per-answer cap c with sum(min(size, c)) <= budget, or None if everything fits"""
+    remaining = budget
+    for i, size in enumerate(sorted(sizes)):
+        share = remaining // (len(sizes) - i)
+        if size > share:
+            return max(share, 0)
+        remaining -= size
+    return None
+
+
+def _format_qa(question, answer) -> str:
+    return f"Q: {question}\nA: {answer}"
+
+
+def prepare_user_input(client, qa_pairs, uploads=None) -> str:
+    """
+    Assemble the user message for generation, keeping it within INGEST_MAX_INPUT_TOKENS
+
+    SME answers are kept verbatim; only answers that are themselves oversize (e.g. a pasted
+    runbook) are condensed, longest first. Uploads are streamed paragraph by paragraph and
+    summarized only if they do not fit in the remaining budget.
+
+    Args:
+        client: OpenAI client
+        qa_pairs: List of (question, answer) pairs from the submitted answers
+        uploads: Optional list of uploaded files (werkzeug FileStorage)
+
+    Returns:
+        str: Text to send as the user message
+
+    Raises:
+        InputTooLargeError: If the input cannot be condensed to fit the budget
+        UploadError: If an uploaded file cannot be read
+    """
+    qa_budget = INGEST_MAX_INPUT_TOKENS - (INGEST_UPLOAD_MIN_TOKENS if uploads else 0)
+
+    answers = [str(answer) for _, answer in qa_pairs]
+    answer_tokens = [count_tokens(answer) for answer in answers]
+    overhead = sum(count_tokens(_format_qa(question, "")) + 2 for question, _ in qa_pairs)
+    cap = _answer_token_cap(answer_tokens, qa_budget - overhead)
+    if cap is not None:
+        oversize = [i for i, tokens in enumerate(answer_tokens) if tokens > cap]
+        logger.info(f"Answers exceed budget of {qa_budget} tokens, condensing {len(oversize)} "
+                    f"oversize answers to {cap} tokens each")
+        if cap <= 0:
+            raise InputTooLargeError(f"Questions alone exceed the budget of {qa_budget} tokens")
+        with ThreadPoolExecutor(max_workers=min(INGEST_MAX_WORKERS, len(oversize))) as executor:
+            condensed = executor.map(lambda i: condense(client, _text_paragraphs(answers[i]), cap), oversize)
+            for i, answer in zip(oversize, condensed):
+                answers[i] = answer
+
+    qa_text = "\n\n".join(_format_qa(question, answer) for (question, _), answer in zip(qa_pairs, answers))
+    qa_tokens = count_tokens(qa_text)
+    if qa_tokens > qa_budget:
+        raise InputTooLargeError(f"Answers could not be condensed below {qa_budget} tokens")
+    if not uploads:
+        return qa_text
+
+    material, summarized = fit_or_condense(client, _iter_upload_material(uploads),
+                                           INGEST_MAX_INPUT_TOKENS - qa_tokens)
+    if summarized:
+        material = "Supporting material (summarized):\n\n" + material
+    return "\n\n".join(part for part in (qa_text, material) if part)
@@ -1,21 +1,15 @@
 # mcp_client.py
 import asyncio
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp_session_pool import MCPSessionPool
 
-async def call_say_hello(name: str) -> str:
-    params = StdioServerParameters(command="python", args=["server.py"])
-    async with stdio_client(params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            result = await session.call_tool("say_hello", {"name": name})
-            # Extract string(s) from the ToolResponse content
-            texts = []
-            for item in result.content:
-                if item.type == "text":   # guaranteed by SDK
-                    texts.append(item.text)
-            return "\n".join(texts) if texts else str(result)
+async def call_say_hello(pool: MCPSessionPool, name: str) -> str:
+    # Reuses a warm session from the pool instead of spawning server.py per call
+    return await pool.call_tool("say_hello", {"name": name})
+
+async def main():
+    async with MCPSessionPool() as pool:
+        out = await call_say_hello(pool, "Alice")
+        print("MCP said:", out)
 
 if __name__ == "__main__":
-    out = asyncio.run(call_say_hello("Alice"))
-    print("MCP said:", out)
+    asyncio.run(main())
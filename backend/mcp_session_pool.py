@@ -0,0 +1,270 @@
+# mcp_session_pool.py
+"""
+Pool of long-lived MCP stdio sessions, so tool calls skip the process spawn and handshake
+
+Sessions stay warm only for as long as the pool's owner runs: create one pool per
+long-running process and reuse it, rather than one per conversation.
+"""
+import os
+import asyncio
+import logging
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+logger = logging.getLogger(__name__)
+
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND", "python")
+MCP_SERVER_ARGS = os.getenv("MCP_SERVER_ARGS", "server.py").split()
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+MCP_START_TIMEOUT = float(os.getenv("MCP_START_TIMEOUT", "15"))
+
+
+class MCPSessionClosedError(ConnectionError):
+    """Raised when the MCP server subprocess exits while a call is waiting on it"""
+
+
+def result_text(result) -> str:
+    """Extract the text content of a tool result"""
+    texts = []
+    for item in result.content:
+        if getattr(item, "type", None) == "text":
+            texts.append(item.text)
+    return "\n".join(texts) if texts else str(result)
+
+
+class _PooledSession:
+    """One MCP server subprocess with an initialized ClientSession, owned by its own task"""
+
+    def __init__(self, params: StdioServerParameters, index: int):
+        self.params = params
+        self.index = index
+        self.session = None
+        self.transport_closed = False
+        self.stopped = asyncio.Event()
+        self._closing = False
+        self._ready = asyncio.Event()
+        self._error = None
+        self._task = None
+
+    async def start(self, timeout: float = MCP_START_TIMEOUT):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Cancelling the owning task exits stdio_client, which terminates the subprocess
+            self._closing = True
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            raise asyncio.TimeoutError(f"MCP session {self.index} did not initialize within {timeout}s")
+        if self._error is not None:
+            raise self._error
+
+    async def _relay(self, read, session_write):
+        # Forward server messages to the session and notice as soon as the subprocess's stdout closes
+        try:
+            async with session_write:
+                async for message in read:
+                    await session_write.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            pass
+        finally:
+            self.transport_closed = True
+            self.stopped.set()
+            if not self._closing:
+                logger.error(f"MCP session {self.index} server process exited")
+
+    async def _run(self):
+        # The stdio transport and session contexts must be entered and exited in the same task
+        try:
+            async with stdio_client(self.params) as (read, write):
+                session_write, session_read = anyio.create_memory_object_stream(0)
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(self._relay, read, session_write)
+                    async with ClientSession(session_read, write) as session:
+                        await session.initialize()
+                        self.session = session
+                        self._ready.set()
+                        await self.stopped.wait()
+                    tg.cancel_scope.cancel()
+        except Exception as e:
+            self._error = e
+            logger.error(f"MCP session {self.index} terminated: {e}")
+        finally:
+            self.session = None
+            self.stopped.set()
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return (self.session is not None and not self.transport_closed
+                and self._task is not None and not self._task.done())
+
+    async def close(self):
+        self._closing = True
+        self.stopped.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+                # Wait for stdio_client to finish terminating the subprocess
+                await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MCPSessionPool:
+    """Keeps warm MCP sessions, hands them out per call and restarts any that crash"""
+
+    def __init__(self, command: str = MCP_SERVER_COMMAND, args=None, size: int = MCP_POOL_SIZE,
+                 call_timeout: float = MCP_CALL_TIMEOUT,
+                 health_check_interval: float = MCP_HEALTH_CHECK_INTERVAL,
+                 start_timeout: float = MCP_START_TIMEOUT):
+        self.params = StdioServerParameters(command=command, args=list(args or MCP_SERVER_ARGS))
+        self.size = size
+        self.call_timeout = call_timeout
+        self.start_timeout = start_timeout
+        self.health_check_interval = health_check_interval
+        self._sessions = []
+        self._available = None
+        self._health_task = None
+        self._recycling = set()
+
+    async def start(self):
+        """Spawn and initialize all sessions"""
+        self._available = asyncio.Queue()
+        self._sessions = [_PooledSession(self.params, i) for i in range(self.size)]
+        results = await asyncio.gather(*(s.start(self.start_timeout) for s in self._sessions),
+                                       return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await self.close()
+            raise errors[0]
+        for s in self._sessions:
+            self._available.put_nowait(s)
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"Started MCP session pool with {self.size} sessions")
+
+    async def close(self):
+        """Shut down all sessions and their subprocesses"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for task in list(self._recycling):
+            task.cancel()
+        await asyncio.gather(*(s.close() for s in self._sessions), return_exceptions=True)
+        self._sessions = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _restart(self, pooled: _PooledSession) -> _PooledSession:
+        logger.info(f"Restarting MCP session {pooled.index}")
+        await pooled.close()
+        replacement = _PooledSession(self.params, pooled.index)
+        await replacement.start(self.start_timeout)
+        self._sessions[pooled.index] = replacement
+        return replacement
+
+    async def _recycle(self, pooled: _PooledSession):
+        try:
+            pooled = await self._restart(pooled)
+        except Exception as e:
+            logger.error(f"Failed to restart MCP session {pooled.index}: {e}")
+        finally:
+            self._available.put_nowait(pooled)
+
+    async def _ping(self, pooled: _PooledSession) -> bool:
+        if not pooled.alive:
+            return False
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), timeout=self.call_timeout)
+            return True
+        except Exception as e:
+            logger.error(f"MCP session {pooled.index} failed health check: {e}")
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            # Only check idle sessions, so in-flight calls are not disturbed
+            for _ in range(self._available.qsize()):
+                pooled = self._available.get_nowait()
+                try:
+                    if not await self._ping(pooled):
+                        pooled = await self._restart(pooled)
+                except Exception as e:
+                    logger.error(f"Failed to restart MCP session {pooled.index}: {e}")
+                finally:
+                    self._available.put_nowait(pooled)
+
+    async def _call(self, pooled: _PooledSession, tool_name: str, args: dict):
+        """Call a tool, failing fast if the server process exits before it answers"""
+        call = asyncio.ensure_future(pooled.session.call_tool(tool_name, args))
+        stopped = asyncio.ensure_future(pooled.stopped.wait())
+        try:
+            done, _ = await asyncio.wait({call, stopped}, timeout=self.call_timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+        if call in done:
+            return call.result()
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        if stopped in done:
+            raise MCPSessionClosedError(f"MCP session {pooled.index} closed during {tool_name}")
+        raise asyncio.TimeoutError(f"MCP tool {tool_name} timed out after {self.call_timeout}s")
+
+    async def call_tool(self, tool_name: str, args: dict) -> str:
+        """
+        Call a tool on a pooled session, restarting sessions whose server process has exited
+
+        The call is only retried when the request could not be sent; a tool that may
+        already have run is never re-executed.
+
+        Args:
+            tool_name: Name of the MCP tool
+            args: Tool arguments
+
+        Returns:
+            str: Text content of the tool result
+        """
+        pooled = await self._available.get()
+        try:
+            if not pooled.alive:
+                pooled = await self._restart(pooled)
+            try:
+                result = await self._call(pooled, tool_name, args)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+                # The transport was gone before the request was written, so retrying is safe
+                logger.error(f"MCP session {pooled.index} unavailable for {tool_name}: {e}")
+                pooled = await self._restart(pooled)
+                result = await self._call(pooled, tool_name, args)
+            return result_text(result)
+        finally:
+            if pooled.alive:
+                self._available.put_nowait(pooled)
+            else:
+                # Replace a crashed session in the background so the caller is not held up
+                task = asyncio.create_task(self._recycle(pooled))
+                self._recycling.add(task)
+                task.add_done_callback(self._recycling.discard)
+
+    async def call_tools(self, calls) -> list:
+        """
+        Run several tool calls concurrently across the pool
+
+        Args:
+            calls: Iterable of (tool_name, args) pairs
+
+        Returns:
+            list: Result text (or the raised exception) per call, in order
+        """
+        return await asyncio.gather(*(self.call_tool(name, args) for name, args in calls),
+                                    return_exceptions=True)
@@ -2,29 +2,27 @@
 import os
 import json
 import asyncio
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from openai import OpenAI
 from dotenv import load_dotenv
+from mcp_session_pool import MCPSessionPool
 load_dotenv()
 client = OpenAI()
 
 OPENAI_MODEL = "gpt-4o-mini"
 client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 
-async def call_mcp_tool(tool_name: str, args: dict) -> str:
-    params = StdioServerParameters(command="python", args=["server.py"])
-    async with stdio_client(params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, args)
-            texts = []
-            for item in result.content:
-                if getattr(item, "type", None) == "text":
-                    texts.append(item.text)
-            return "\n".join(texts) if texts else str(result)
+async def main():
+    # Warm up MCP sessions while the model decides whether it needs a tool
+    pool = MCPSessionPool()
+    pool_started = asyncio.create_task(pool.start())
+    try:
+        await run_conversation(pool, pool_started)
+    finally:
+        if not pool_started.done():
+            pool_started.cancel()
+        await pool.close()
 
-def main():
+async def run_conversation(pool: MCPSessionPool, pool_started: asyncio.Task):
     # 1) First request: let the model decide whether to call the tool
     messages = [
         {"role": "system", "content": "You can call external tools via MCP when needed."},
@@ -44,7 +42,8 @@ def main():
         }
     }]
 
-    first = client.chat.completions.create(
+    first = await asyncio.to_thread(
+        client.chat.completions.create,
         model=OPENAI_MODEL,
         messages=messages,
         tools=tools
@@ -65,29 +64,38 @@ def main():
         "tool_calls": [tc.model_dump() for tc in tool_calls]  # ensure serializable
     })
 
-    # 3) Execute each requested tool call via MCP and add tool results
+    # 3) Execute all requested tool calls concurrently via the MCP pool and add tool results
+    requested = []
     for tc in tool_calls:
         if tc.type == "function" and tc.function.name == "say_hello":
             args = {}
             if tc.function.arguments:
                 # arguments is JSON string per spec
                 args = json.loads(tc.function.arguments)
-            tool_result = asyncio.run(call_mcp_tool(tc.function.name, args))
+            requested.append((tc, args))
 
-            # Append the tool result message referencing tool_call_id
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tc.id,
-                "name": tc.function.name,
-                "content": tool_result
-            })
+    await pool_started
+    results = await pool.call_tools((tc.function.name, args) for tc, args in requested)
+
+    for (tc, _), tool_result in zip(requested, results):
+        if isinstance(tool_result, Exception):
+            tool_result = f"Tool call failed: {tool_result}"
+
+        # Append the tool result message referencing tool_call_id
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tc.id,
+            "name": tc.function.name,
+            "content": tool_result
+        })
 
     # 4) Ask the model for the final answer using the complete history
-    final = client.chat.completions.create(
+    final = await asyncio.to_thread(
+        client.chat.completions.create,
         model=OPENAI_MODEL,
         messages=messages
     )
     print("Model final answer:", final.choices[0].message.content)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
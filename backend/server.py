@@ -1,19 +1,35 @@
-from flask import Flask, request, send_file, jsonify
-from flask_cors import CORS
-from werkzeug.utils import secure_filename
-from io import BytesIO
-from docx import Document
 import os
-import psycopg2
-import psycopg2.extras
-from openai import OpenAI
-from dotenv import load_dotenv
 import logging
 import sys
-from storage_handler import StorageHandler
-
+import json
+from io import BytesIO
+from functools import lru_cache
+from datetime import datetime, timezone
+from startup import startup_state
+
+# Time heavy imports so cold-start cost is visible per component
+with startup_state.timed_import('flask'):
+    from flask import Flask, request, send_file, jsonify, Response
+    from flask_cors import CORS
+    from werkzeug.utils import secure_filename
+    from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+with startup_state.timed_import('python-docx'):
+    from docx import Document
+with startup_state.timed_import('psycopg2'):
+    import psycopg2
+    import psycopg2.extras
+with startup_state.timed_import('openai'):
+    from openai import OpenAI, APIStatusError
+from dotenv import load_dotenv
 load_dotenv()
 
+# Also creates the GCS/S3 client when cloud storage is enabled
+with startup_state.timed_import('storage'):
+    from storage_handler import StorageHandler
+from document_cache import DocumentCache
+from input_ingestion import prepare_user_input, count_tokens, InputTooLargeError, UploadError, is_supported_upload
+from archive_export import stream_documents_zip
+
 # Configure logging to stdout (Docker logs)
 logging.basicConfig(
     level=logging.INFO,
@@ -36,14 +52,35 @@ DB_CONFIG = {
     'sslmode': os.getenv('DB_SSL_MODE', 'prefer')
 }
 
-client = OpenAI(
-    api_key=API_KEY,
-    base_url=BASE_URL
-)
+with startup_state.timed_import('openai_client'):
+    client = OpenAI(
+        api_key=API_KEY,
+        base_url=BASE_URL
+    )
+
+# Warm-up always opens a connection to the LLM endpoint; with WARMUP_LLM_PING it must also
+# answer the model listing successfully (not all gateways support it)
+WARMUP_LLM_PING = os.getenv('WARMUP_LLM_PING', 'false').lower() == 'true'
+WARMUP_LLM_TIMEOUT = float(os.getenv('WARMUP_LLM_TIMEOUT', '10'))
+
+# Request body limits
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))
+DOWNLOAD_MAX_ANSWER_BYTES = int(os.getenv('DOWNLOAD_MAX_ANSWER_BYTES', str(1024 * 1024)))
+DOWNLOAD_STREAM_CHUNK_SIZE = 64 * 1024
+
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 CORS(app)  # Enable CORS for all routes
 
+# Rendered /download documents, keyed by template + answer text
+document_cache = DocumentCache()
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({'error': f'Request body exceeds the {MAX_CONTENT_LENGTH} byte limit'}), 413
+
 INITIAL_PROMPT = "You are given brief, informal answers from a subject-matter expert (SME). Your task is to convert those answers into a **formal, auditor-quality standard operating procedure (SOP)**.\n\n" \
 "The output must be clear, structured, and repeatable, suitable for internal control, governance, or audit review.\n\n" \
 "**Document Template / Structure**\n" \
@@ -108,12 +145,8 @@ INITIAL_PROMPT = "You are tasked with generating a documented PCI DSS / PCI PIN
 '''
 
 def get_template_from_docx(docx_path):
-    doc = Document(docx_path)
-    content = []
-    for para in doc.paragraphs:
-        content.append(para.text)
-    template_text = "\n".join(content)
-    return template_text
+    # Built from the cached parse so Procedure.docx is not re-read per submission
+    return "\n".join(text for text, _ in load_template_paragraphs(docx_path))
 
 def extract_template_sections(docx_path):
     doc = Document(docx_path)
@@ -132,25 +165,45 @@ def health_check():
     logger.info("Health check endpoint accessed")
     return jsonify({"status": "healthy", "service": "compliance-procedure-generator-api"})
 
-def create_docx_from_gpt(template_path, gpt_answer):
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """Report ready only once DB, storage, template and LLM client are warmed up"""
+    ready = startup_state.is_ready()
+    body = {"status": "ready" if ready else "starting", "service": "compliance-procedure-generator-api"}
+    # Public health-check path: statuses and timings only, error details stay in the server log
+    body.update(startup_state.snapshot(include_errors=False))
+    return jsonify(body), 200 if ready else 503
+
+@lru_cache(maxsize=4)
+def _load_template_paragraphs(template_path, template_mtime):
+    """Parse template once per file version into (text, style name) pairs"""
     template_doc = Document(template_path)
+    return tuple((p.text, p.style.name) for p in template_doc.paragraphs)
+
+def load_template_paragraphs(template_path):
+    """Get parsed template paragraphs, re-parsing only when the file changes"""
+    return _load_template_paragraphs(template_path, os.path.getmtime(template_path))
+
+def create_docx_from_gpt(template_path, gpt_answer):
+    template_paragraphs = load_template_paragraphs(template_path)
+    headings = {text for text, style in template_paragraphs if style.startswith('Heading')}
     new_doc = Document()
     answer_sections = {}
     current_section = None
     for line in gpt_answer.split('\n'):
         # Match section headings from template
-        if line.strip() in [p.text for p in template_doc.paragraphs if p.style.name.startswith('Heading')]:
+        if line.strip() in headings:
             current_section = line.strip()
             answer_sections[current_section] = []
         elif current_section:
             answer_sections[current_section].append(line)
     # Build new docx using template headings and answer content
-    for para in template_doc.paragraphs:
-        if para.style.name.startswith('Heading'):
+    for text, style in template_paragraphs:
+        if style.startswith('Heading'):
             # Use built-in heading style
-            level = int(para.style.name.replace('Heading ', ''))
-            new_doc.add_heading(para.text, level=level)
-            content = answer_sections.get(para.text, [])
+            level = int(style.replace('Heading ', ''))
+            new_doc.add_heading(text, level=level)
+            content = answer_sections.get(text, [])
             for c in content:
                 if c.strip().startswith('- '):
                     new_doc.add_paragraph(c.strip()[2:], style='List Bullet')
@@ -160,21 +213,47 @@ def create_docx_from_gpt(template_path, gpt_answer):
                     new_doc.add_paragraph(c.strip(), style='Normal')
         else:
             # Use 'Normal' for non-heading paragraphs
-            new_doc.add_paragraph(para.text, style='Normal')
+            new_doc.add_paragraph(text, style='Normal')
     return new_doc
 
-@app.route("/download", methods=["POST"])
-def download():
-    answer = request.form["answer"]
-    doc = create_docx_from_gpt("Procedure.docx", answer)
+def render_docx_bytes(template_path, gpt_answer):
+    """Render an answer into .docx bytes, reusing a cached render for identical input"""
+    template_version = f"{template_path}:{os.path.getmtime(template_path)}"
+    key = DocumentCache.make_key(template_version, gpt_answer)
+    data = document_cache.get(key)
+    if data is not None:
+        logger.info(f"Document cache hit: {document_cache.stats()}")
+        return data
+
+    doc = create_docx_from_gpt(template_path, gpt_answer)
     file_stream = BytesIO()
     doc.save(file_stream)
-    file_stream.seek(0)
-    return send_file(
-        file_stream,
-        as_attachment=True,
-        download_name="procedure_document.docx",
-        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    data = file_stream.getvalue()
+    document_cache.put(key, data)
+    logger.info(f"Document cache miss: {document_cache.stats()}")
+    return data
+
+def _iter_chunks(data, chunk_size=DOWNLOAD_STREAM_CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+@app.route("/download", methods=["POST"])
+def download():
+    # MAX_CONTENT_LENGTH bounds form parsing; the answer itself is limited by its decoded size
+    answer = request.form.get("answer")
+    if answer is None:
+        return jsonify({'error': 'Answer is required'}), 400
+    if len(answer.encode('utf-8')) > DOWNLOAD_MAX_ANSWER_BYTES:
+        return jsonify({'error': 'Answer too large'}), 413
+
+    data = render_docx_bytes(DOCX_TEMPLATE_PATH, answer)
+    return Response(
+        _iter_chunks(data),
+        mimetype=DOCX_MIMETYPE,
+        headers={
+            'Content-Disposition': 'attachment; filename=procedure_document.docx',
+            'Content-Length': str(len(data))
+        }
     )
 
 """
@@ -270,10 +349,24 @@ def get_team_questions(team_id):
 def submit_answers():
     """Handle form submission and generate compliance document"""
     try:
-        data = request.get_json()
+        # Answers arrive as JSON, or as multipart with a JSON 'payload' field plus file 'attachments'
+        uploads = []
+        if request.mimetype == 'multipart/form-data':
+            try:
+                data = json.loads(request.form.get('payload') or '{}')
+            except ValueError:
+                return jsonify({'error': 'payload must be valid JSON'}), 400
+            uploads = [f for f in request.files.getlist('attachments') if f.filename]
+        else:
+            data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
+        for upload in uploads:
+            # Check the original name; secure_filename strips non-ASCII stems like "отчет.docx" down to "docx"
+            if not is_supported_upload(upload.filename):
+                return jsonify({'error': f'Unsupported file type: {upload.filename}'}), 400
+
         team_id = data.get('team_id')
         team_name = data.get('team_name')
         answers = data.get('answers', {})
@@ -281,12 +374,16 @@ def submit_answers():
         if not team_id or not answers:
             return jsonify({'error': 'Team ID and answers are required'}), 400
 
-        # Convert answers to text format for AI processing
-        # user_input = f"Team: {team_name}\n\n"
-        user_input = ""
-        for answer_data in answers.values():
-            user_input += f"Q: {answer_data['question']}\n"
-            user_input += f"A: {answer_data['answer']}\n\n"
+        # Convert answers to text format for AI processing, condensing oversize answers and uploads
+        qa_pairs = [(answer_data['question'], answer_data['answer']) for answer_data in answers.values()]
+        try:
+            user_input = prepare_user_input(client, qa_pairs, uploads)
+        except InputTooLargeError as e:
+            logger.error(f"Submission for team_id {team_id} too large: {e}")
+            return jsonify({'error': 'Answers and attachments are too long to process; please shorten them'}), 413
+        except UploadError as e:
+            logger.error(f"Unreadable upload for team_id {team_id}: {e}")
+            return jsonify({'error': str(e)}), 400
 
         # logger.info(f"User input for AI:\n{user_input}")
         # Generate document using AI
@@ -343,6 +440,9 @@ def submit_answers():
             'message': 'Document generated successfully'
         })
 
+    except HTTPException:
+        # Let Flask render client errors such as 413 from request parsing
+        raise
     except Exception as e:
         logger.error(f"Error processing submission: {e}")
         return jsonify({'error': 'Failed to generate document'}), 500
@@ -371,6 +471,97 @@ def download_generated_file(filename):
         logger.error(f"Error downloading file: {e}")
         return jsonify({'error': 'Failed to download file'}), 500
 
+@app.route('/api/download_all', methods=['GET'])
+def download_all_documents():
+    """Stream a ZIP of generated documents for all teams, or those listed in ?team_ids=1,2,3"""
+    team_ids = request.args.get('team_ids')
+    try:
+        team_ids = [int(t) for t in team_ids.split(',') if t.strip()] if team_ids else None
+    except ValueError:
+        return jsonify({'error': 'team_ids must be a comma-separated list of integers'}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        query = """
+            SELECT tcp.team_id, t.name AS team_name, tcp.document_name, tcp.created_at, tcp.updated_at
+            FROM teams_compliance_procedures tcp
+            JOIN teams t ON t.id = tcp.team_id
+        """
+        if team_ids is not None:
+            cur.execute(query + " WHERE tcp.team_id = ANY(%s) ORDER BY t.name", (team_ids,))
+        else:
+            cur.execute(query + " ORDER BY t.name")
+        records = [dict(row) for row in cur.fetchall()]
+        cur.close()
+        conn.close()
+    except psycopg2.Error as e:
+        logger.error(f"Database query error: {e}")
+        if conn:
+            conn.close()
+        return jsonify({'error': 'Failed to fetch team procedures'}), 500
+
+    if not records:
+        return jsonify({'error': 'No documents found'}), 404
+
+    archive_name = f"compliance_procedures_{datetime.now(timezone.utc).strftime('%Y%m%d')}.zip"
+    logger.info(f"Streaming export of {len(records)} documents as {archive_name}")
+    return Response(
+        stream_documents_zip(records),
+        mimetype="application/zip",
+        headers={'Content-Disposition': f'attachment; filename={archive_name}'}
+    )
+
+def _warm_up_database():
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+    finally:
+        conn.close()
+
+def _warm_up_template():
+    load_template_paragraphs(DOCX_TEMPLATE_PATH)
+    # Render once so python-docx's default template and styles are loaded too
+    create_docx_from_gpt(DOCX_TEMPLATE_PATH, "")
+
+def _warm_up_llm_client():
+    # with_options shares the client's connection pool, so the connection opened here is reused
+    try:
+        client.with_options(timeout=WARMUP_LLM_TIMEOUT, max_retries=0).models.list()
+    except APIStatusError as e:
+        # Any HTTP response means DNS, TLS and the connection are warm; only strict mode needs a 2xx
+        if WARMUP_LLM_PING:
+            raise
+        logger.info(f"LLM endpoint reachable (model listing returned {e.status_code})")
+
+def _warm_up_tokenizer():
+    # Loads the tiktoken encoding (bounded by INGEST_TOKENIZER_LOAD_TIMEOUT) before the first submission
+    count_tokens("warm")
+
+def start_warmup():
+    """Warm up dependencies in the process that serves traffic"""
+    startup_state.start({
+        'database': _warm_up_database,
+        'storage': StorageHandler.check_connection,
+        'template': _warm_up_template,
+        'tokenizer': _warm_up_tokenizer,
+        'llm_client': _warm_up_llm_client
+    })
+
 if __name__ == "__main__":
+    # With debug=True the werkzeug reloader parent only watches files and re-runs this
+    # script in a child (WERKZEUG_RUN_MAIN=true) that serves requests, so warm up there only
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     logger.info("Starting Flask application on port 9090")
-    app.run(debug=True, host='0.0.0.0', port=9090)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=9090)
+else:
+    # Imported by a WSGI server, which serves from this process
+    start_warmup()
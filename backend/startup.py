@@ -0,0 +1,107 @@
+"""
+Startup timing, warm-up and readiness tracking - stdlib only so it can be imported before heavy modules
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+WARMUP_IN_BACKGROUND = os.getenv('WARMUP_IN_BACKGROUND', 'true').lower() == 'true'
+WARMUP_RETRY_INTERVAL = float(os.getenv('WARMUP_RETRY_INTERVAL', '5'))
+
+
+class StartupState:
+    """Records import/initialization timings and which components are warmed up"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.imports = {}
+        self.components = {}
+        self._thread = None
+
+    @contextmanager
+    def timed_import(self, name: str):
+        """Time a block of imports (and any module-level initialization they trigger)"""
+        start = time.perf_counter()
+        yield
+        with self._lock:
+            self.imports[name] = round(time.perf_counter() - start, 4)
+
+    def register(self, name: str) -> None:
+        """Declare a component that must be warmed up before the instance is ready"""
+        with self._lock:
+            self.components.setdefault(name, {'ready': False, 'seconds': None, 'attempts': 0, 'error': None})
+
+    def _run_step(self, name: str, step) -> bool:
+        start = time.perf_counter()
+        try:
+            step()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+            logger.error(f"Warm-up of {name} failed: {e}")
+        seconds = round(time.perf_counter() - start, 4)
+        with self._lock:
+            component = self.components[name]
+            component['attempts'] += 1
+            component['seconds'] = seconds
+            component['ready'] = ok
+            component['error'] = error
+        if ok:
+            logger.info(f"Warmed up {name} in {seconds}s")
+        return ok
+
+    def _warm_up(self, steps: dict, retry_interval: float, retrying: bool = False) -> None:
+        pending = dict(steps)
+        while True:
+            if retrying:
+                time.sleep(retry_interval)
+            retrying = True
+            pending = {name: step for name, step in pending.items() if not self._run_step(name, step)}
+            if not pending:
+                logger.info(f"Instance ready: {self.snapshot()}")
+                return
+
+    def start(self, steps: dict, background: bool = WARMUP_IN_BACKGROUND,
+              retry_interval: float = WARMUP_RETRY_INTERVAL) -> None:
+        """
+        Run warm-up steps, retrying failed ones until every component is ready
+
+        Args:
+            steps: Mapping of component name to a callable that initializes it (raises on failure)
+            background: Run in a daemon thread instead of blocking startup
+            retry_interval: Seconds to wait between retries of failed steps
+        """
+        for name in steps:
+            self.register(name)
+
+        if not background:
+            failed = {name: step for name, step in steps.items() if not self._run_step(name, step)}
+            if not failed:
+                logger.info(f"Instance ready: {self.snapshot()}")
+                return
+            # Keep retrying whatever failed without holding up startup any further
+            steps = failed
+
+        self._thread = threading.Thread(target=self._warm_up, args=(steps, retry_interval, not background),
+                                        name="startup-warmup", daemon=True)
+        self._thread.start()
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return bool(self.components) and all(c['ready'] for c in self.components.values())
+
+    def snapshot(self, include_errors: bool = True) -> dict:
+        with self._lock:
+            components = {name: dict(c) for name, c in self.components.items()}
+            imports = dict(self.imports)
+        if not include_errors:
+            for component in components.values():
+                component.pop('error', None)
+        return {'imports': imports, 'components': components}
+
+
+startup_state = StartupState()
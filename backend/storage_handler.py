@@ -235,3 +235,20 @@ class StorageHandler:
         except Exception as e:
             logger.error(f"Error checking document existence in local storage: {e}")
             return False
+
+    @staticmethod
+    def check_connection() -> None:
+        """
+        Verify the storage backend is reachable, warming up its client connection
+
+        Raises:
+            Exception: If the backend cannot be reached
+        """
+        if USE_GCS:
+            list(gcs_storage_client.list_blobs(GCS_BUCKET_NAME, prefix="documents/", max_results=1))
+        elif USE_S3:
+            s3_client.list_objects_v2(Bucket=S3_BUCKET_NAME, Prefix="documents/", MaxKeys=1)
+        else:
+            admin_generated_docs_path = os.getenv('ADMIN_DOCS_PATH',
+                "/Users/jhuajun/projects/learnings/compliance_procedure_admin/backend/generated_docs")
+            os.makedirs(admin_generated_docs_path, exist_ok=True)
@@ -121,7 +121,7 @@ resource "aws_lb_target_group" "backend" {
     healthy_threshold   = 2
     interval            = 30
     matcher             = "200"
-    path                = "/"
+    path                = "/ready"
     port                = "traffic-port"
     protocol            = "HTTP"
     timeout             = 5
@@ -127,13 +127,13 @@ resource "google_cloud_run_v2_service" "backend" {
       # Health check configuration
       startup_probe {
         http_get {
-          path = "/"
+          path = "/ready"
           port = 9090
         }
         initial_delay_seconds = 10
         timeout_seconds       = 5
         period_seconds        = 10
-        failure_threshold     = 3
+        failure_threshold     = 12
       }
 
       liveness_probe {
@@ -286,7 +286,7 @@ resource "google_compute_region_health_check" "backend" {
 
   http_health_check {
     port         = 9090
-    request_path = "/"
+    request_path = "/ready"
   }
 
   check_interval_sec  = 30